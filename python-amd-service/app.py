@@ -3,17 +3,21 @@
 from __future__ import annotations
 
 import io
+import json
 import logging
 import os
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import httpx
 import librosa
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi import Body, FastAPI, Header, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, StreamingResponse
 
 from models.voiceguard_loader import VoiceGUARDDetector
+from services.profiling import ProfileRequest, ProfilingController
+from services.result_store import DetectionResultStore
 from utils.websocket_handler import MediaStreamSession, StreamConfig
 
 
@@ -28,7 +32,8 @@ LOGGER.setLevel(logging.DEBUG)
 app = FastAPI(title="VoiceGUARD2 AMD Service", version="1.0.0")
 
 
-detector = VoiceGUARDDetector()
+profiler = ProfilingController()
+detector = VoiceGUARDDetector(profiler=profiler)
 
 stream_config = StreamConfig(
     sample_rate=int(os.getenv("TWILIO_SAMPLE_RATE", "8000")),
@@ -38,12 +43,25 @@ stream_config = StreamConfig(
     fallback_label=os.getenv("FALLBACK_STRATEGY", "human"),
 )
 
+detection_store = DetectionResultStore(
+    max_entries=int(os.getenv("RESULT_STORE_MAX_ENTRIES", "10000")),
+    ttl_seconds=float(os.getenv("RESULT_STORE_TTL_SECONDS", "3600")),
+)
+
+MAX_BATCH_CALL_SIDS = 1000
+MAX_POLL_SECONDS = 60.0
+
 CALLBACK_URL = os.getenv("RESULT_CALLBACK_URL")
 CALLBACK_AUTH_TOKEN = (os.getenv("API_KEY") or "").strip() or None
 
 LOGGER.info("VoiceGUARD2 callback configured: RESULT_CALLBACK_URL=%s, API_KEY=%r", CALLBACK_URL, CALLBACK_AUTH_TOKEN)
 
 
+def _require_bearer(authorization: Optional[str]) -> None:
+    if CALLBACK_AUTH_TOKEN and authorization != f"Bearer {CALLBACK_AUTH_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+
+
 async def dispatch_detection_result(call_sid: str, payload: Dict[str, Any]) -> None:
     if not CALLBACK_URL:
         LOGGER.warning("RESULT_CALLBACK_URL not configured; skipping dispatch")
@@ -80,102 +98,116 @@ async def audio_stream_endpoint(websocket: WebSocket, call_sid: str) -> None:
     await websocket.accept()
     session = MediaStreamSession(detector=detector, config=stream_config)
 
-    try:
-        while not session.detection_made:
-            message = await websocket.receive_json()
-            event_type = message.get("event")
-
-            if event_type == "start":
-                if CALLBACK_AUTH_TOKEN and not token_validated:
-                    start_payload = message.get("start", {})
-                    raw_params = start_payload.get("customParameters") or []
-                    LOGGER.debug("Start event received for %s with custom params: %s", call_sid, raw_params)
-
-                    start_token: Optional[str] = None
-                    if isinstance(raw_params, dict):
-                        start_token = (raw_params.get("authToken") or "").strip()
-                    else:
-                        for param in raw_params:
-                            if isinstance(param, dict) and param.get("name") == "authToken":
-                                start_token = (param.get("value") or "").strip()
-                                break
-
-                    if start_token == CALLBACK_AUTH_TOKEN:
-                        token_validated = True
-                        LOGGER.debug("WebSocket auth succeeded via start event for %s", call_sid)
-                    else:
+    with profiler.session_scope():
+        try:
+            while not session.detection_made:
+                message = await websocket.receive_json()
+                event_type = message.get("event")
+
+                if event_type == "start":
+                    if CALLBACK_AUTH_TOKEN and not token_validated:
+                        start_payload = message.get("start", {})
+                        raw_params = start_payload.get("customParameters") or []
+                        LOGGER.debug("Start event received for %s with custom params: %s", call_sid, raw_params)
+
+                        start_token: Optional[str] = None
+                        if isinstance(raw_params, dict):
+                            start_token = (raw_params.get("authToken") or "").strip()
+                        else:
+                            for param in raw_params:
+                                if isinstance(param, dict) and param.get("name") == "authToken":
+                                    start_token = (param.get("value") or "").strip()
+                                    break
+
+                        if start_token == CALLBACK_AUTH_TOKEN:
+                            token_validated = True
+                            LOGGER.debug("WebSocket auth succeeded via start event for %s", call_sid)
+                        else:
+                            await websocket.close(code=4401)
+                            LOGGER.warning(
+                                "Rejected stream for %s due to invalid start token %r",
+                                call_sid,
+                                start_token,
+                            )
+                            break
+                    continue
+
+                if event_type == "media":
+                    if CALLBACK_AUTH_TOKEN and not token_validated:
                         await websocket.close(code=4401)
-                        LOGGER.warning(
-                            "Rejected stream for %s due to invalid start token %r",
+                        LOGGER.warning("Rejected stream for %s: media received before auth", call_sid)
+                        break
+
+                    media = message.get("media", {})
+                    payload = media.get("payload")
+                    if not payload:
+                        continue
+
+                    detection = session.handle_media_payload(payload)
+                    if detection:
+                        detection_store.record(
                             call_sid,
-                            start_token,
+                            label=detection.label,
+                            confidence=detection.confidence,
+                            timestamp=detection.timestamp,
+                        )
+                        await dispatch_detection_result(
+                            call_sid,
+                            {
+                                "label": detection.label,
+                                "confidence": detection.confidence,
+                                "timestamp": detection.timestamp,
+                            },
+                        )
+                        await websocket.send_json(
+                            {
+                                "event": "detection_result",
+                                "callSid": call_sid,
+                                "label": detection.label,
+                                "confidence": detection.confidence,
+                                "timestamp": detection.timestamp,
+                            }
                         )
                         break
-                continue
 
-            if event_type == "media":
-                if CALLBACK_AUTH_TOKEN and not token_validated:
-                    await websocket.close(code=4401)
-                    LOGGER.warning("Rejected stream for %s: media received before auth", call_sid)
+                elif event_type == "stop":
+                    LOGGER.info("Stream stop received for %s", call_sid)
                     break
 
-                media = message.get("media", {})
-                payload = media.get("payload")
-                if not payload:
-                    continue
-
-                detection = session.handle_media_payload(payload)
-                if detection:
+                timeout_result = session.check_silence_timeout()
+                if timeout_result:
+                    LOGGER.info("Silence timeout triggered for %s", call_sid)
+                    detection_store.record(
+                        call_sid,
+                        label=timeout_result.label,
+                        confidence=timeout_result.confidence,
+                        timestamp=timeout_result.timestamp,
+                        fallback=True,
+                    )
                     await dispatch_detection_result(
                         call_sid,
                         {
-                            "label": detection.label,
-                            "confidence": detection.confidence,
-                            "timestamp": detection.timestamp,
+                            "label": timeout_result.label,
+                            "confidence": timeout_result.confidence,
+                            "timestamp": timeout_result.timestamp,
                         },
                     )
                     await websocket.send_json(
                         {
                             "event": "detection_result",
                             "callSid": call_sid,
-                            "label": detection.label,
-                            "confidence": detection.confidence,
-                            "timestamp": detection.timestamp,
+                            "label": timeout_result.label,
+                            "confidence": timeout_result.confidence,
+                            "timestamp": timeout_result.timestamp,
                         }
                     )
                     break
 
-            elif event_type == "stop":
-                LOGGER.info("Stream stop received for %s", call_sid)
-                break
-
-            timeout_result = session.check_silence_timeout()
-            if timeout_result:
-                LOGGER.info("Silence timeout triggered for %s", call_sid)
-                await dispatch_detection_result(
-                    call_sid,
-                    {
-                        "label": timeout_result.label,
-                        "confidence": timeout_result.confidence,
-                        "timestamp": timeout_result.timestamp,
-                    },
-                )
-                await websocket.send_json(
-                    {
-                        "event": "detection_result",
-                        "callSid": call_sid,
-                        "label": timeout_result.label,
-                        "confidence": timeout_result.confidence,
-                        "timestamp": timeout_result.timestamp,
-                    }
-                )
-                break
-
-    except WebSocketDisconnect:
-        LOGGER.warning("WebSocket disconnected for call %s", call_sid)
-    except Exception as exc:  # pragma: no cover - defensive logging
-        LOGGER.exception("Unexpected streaming error for %s: %s", call_sid, exc)
-        await websocket.close(code=1011)
+        except WebSocketDisconnect:
+            LOGGER.warning("WebSocket disconnected for call %s", call_sid)
+        except Exception as exc:  # pragma: no cover - defensive logging
+            LOGGER.exception("Unexpected streaming error for %s: %s", call_sid, exc)
+            await websocket.close(code=1011)
 
 
 @app.post("/api/predict")
@@ -204,6 +236,152 @@ async def predict_audio(file: UploadFile) -> Dict[str, Any]:
     return prediction
 
 
+@app.get("/api/results")
+async def poll_detection_results(
+    after: int = 0,
+    epoch: Optional[str] = None,
+    timeout: float = 0.0,
+    limit: int = 500,
+    authorization: Optional[str] = Header(default=None),
+) -> Dict[str, Any]:
+    """Return decisions recorded after the ``after`` cursor, long-polling up to ``timeout`` seconds.
+
+    Clients should echo back the ``epoch`` they received. ``reset`` is set when
+    the cursor belonged to a previous process and delivery restarted from the
+    oldest retained decision; ``gap`` is set when decisions newer than the
+    cursor were evicted before they could be delivered.
+    """
+
+    _require_bearer(authorization)
+    if not 0 <= timeout <= MAX_POLL_SECONDS:
+        raise HTTPException(status_code=400, detail=f"timeout must be between 0 and {MAX_POLL_SECONDS:g} seconds")
+    if limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be a positive integer")
+
+    after, reset = detection_store.resume_point(after, epoch)
+    entries = await detection_store.wait_since(after, timeout=timeout, limit=limit)
+    cursor = entries[-1].sequence if entries else after
+    return {
+        "results": [entry.to_dict() for entry in entries],
+        "cursor": cursor,
+        "epoch": detection_store.epoch,
+        "reset": reset,
+        "gap": detection_store.has_gap(after),
+    }
+
+
+@app.post("/api/results/query")
+async def query_detection_results(
+    call_sids: List[str] = Body(..., embed=True, alias="callSids"),
+    authorization: Optional[str] = Header(default=None),
+) -> Dict[str, Any]:
+    """Look up the stored decisions for a batch of call SIDs."""
+
+    _require_bearer(authorization)
+    if len(call_sids) > MAX_BATCH_CALL_SIDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_CALL_SIDS} callSids per request")
+
+    found = detection_store.get_many(call_sids)
+    return {
+        "results": {call_sid: entry.to_dict() for call_sid, entry in found.items()},
+        "missing": [call_sid for call_sid in call_sids if call_sid not in found],
+    }
+
+
+@app.get("/api/results/events")
+async def stream_detection_results(
+    after: Optional[int] = None,
+    epoch: Optional[str] = None,
+    authorization: Optional[str] = Header(default=None),
+    last_event_id: Optional[str] = Header(default=None),
+) -> StreamingResponse:
+    """Server-sent event stream of new decisions, resumable via ``Last-Event-ID``.
+
+    Event ids are ``<epoch>:<sequence>``. A ``resync`` event is sent when the
+    resume cursor was reset, and whenever decisions after the cursor were
+    evicted before they could be delivered.
+    """
+
+    _require_bearer(authorization)
+    if after is None and last_event_id:
+        last_epoch, _, last_sequence = last_event_id.rpartition(":")
+        if last_sequence.isdigit():
+            after, epoch = int(last_sequence), last_epoch or None
+    if after is None:
+        after = detection_store.cursor
+
+    start, reset = detection_store.resume_point(after, epoch)
+
+    async def event_stream() -> AsyncIterator[str]:
+        async for event, payload in detection_store.follow(start, reset=reset):
+            if event == "keepalive":
+                yield ": keepalive\n\n"
+            elif event == "resync":
+                yield f"event: resync\ndata: {json.dumps(payload)}\n\n"
+            else:
+                event_id = f"{detection_store.epoch}:{payload.sequence}"
+                yield f"id: {event_id}\nevent: {event}\ndata: {json.dumps(payload.to_dict())}\n\n"
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@app.get("/api/results/{call_sid}")
+async def get_detection_result(call_sid: str, authorization: Optional[str] = Header(default=None)) -> Dict[str, Any]:
+    """Return the stored decision for a single call."""
+
+    _require_bearer(authorization)
+    entry = detection_store.get(call_sid)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="No detection result stored for this call")
+    return entry.to_dict()
+
+
+@app.post("/admin/profile")
+async def capture_profile(
+    duration_seconds: float = 30.0,
+    max_sessions: Optional[int] = None,
+    sample_interval_ms: float = 5.0,
+    torch_profiler: bool = True,
+    record_shapes: bool = False,
+    top_operators: int = 25,
+    authorization: Optional[str] = Header(default=None),
+) -> Dict[str, Any]:
+    """Profile live sessions for a bounded window and return the captured artifact."""
+
+    if not CALLBACK_AUTH_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling requires API_KEY to be configured")
+    _require_bearer(authorization)
+
+    request = ProfileRequest(
+        duration_seconds=duration_seconds,
+        max_sessions=max_sessions,
+        sample_interval_ms=sample_interval_ms,
+        torch_profiler=torch_profiler,
+        record_shapes=record_shapes,
+        top_operators=top_operators,
+    )
+    try:
+        return await profiler.capture(request)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    except RuntimeError as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+
+
+@app.get("/admin/profile/traces/{name}")
+async def download_profile_trace(name: str, authorization: Optional[str] = Header(default=None)) -> FileResponse:
+    """Download a Chrome trace exported by a previous profiling capture."""
+
+    if not CALLBACK_AUTH_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling requires API_KEY to be configured")
+    _require_bearer(authorization)
+
+    path = profiler.trace_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Trace not found")
+    return FileResponse(path, media_type="application/json", filename=name)
+
+
 @app.get("/health")
 async def health_check() -> Dict[str, Any]:
     """Return service health metadata."""
@@ -213,5 +391,6 @@ async def health_check() -> Dict[str, Any]:
         "model": "VoiceGUARD2",
         "device": str(detector.device),
         "min_confidence": stream_config.min_confidence,
+        "stored_results": len(detection_store),
     }
 
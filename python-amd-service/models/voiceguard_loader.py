@@ -4,9 +4,10 @@ from __future__ import annotations
 
 import logging
 import os
+from contextlib import nullcontext
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional, Sequence, Union
+from typing import TYPE_CHECKING, Optional, Sequence, Union
 
 import librosa
 import numpy as np
@@ -16,6 +17,9 @@ from transformers import AutoConfig, AutoFeatureExtractor, AutoModelForAudioClas
 
 from services.model_downloader import ensure_voiceguard_weights
 
+if TYPE_CHECKING:  # pragma: no cover - typing only
+    from services.profiling import ProfilingController
+
 
 LOGGER = logging.getLogger(__name__)
 
@@ -66,6 +70,8 @@ class VoiceGUARDDetector:
         self,
         model_path: Optional[Union[str, Path]] = None,
         target_sample_rate: int = 16000,
+        profiler: Optional["ProfilingController"] = None,
+        device: Optional[str] = None,
     ) -> None:
         model_root = Path(model_path or os.getenv("MODEL_PATH", f"./models/{DEFAULT_LOCAL_SUBDIR}"))
         model_root = model_root.resolve()
@@ -73,8 +79,9 @@ class VoiceGUARDDetector:
         LOGGER.info("Loading VoiceGUARD2 assets from %s", model_root)
         _ensure_model_files(model_root)
 
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
         self.target_sample_rate = target_sample_rate
+        self.profiler = profiler
 
         self.config = AutoConfig.from_pretrained(model_root)
         self.feature_extractor = AutoFeatureExtractor.from_pretrained(model_root)
@@ -113,18 +120,20 @@ class VoiceGUARDDetector:
         return waveform.astype(np.float32)
 
     def _run_inference(self, waveform_np: np.ndarray) -> dict:
-        inputs = self.feature_extractor(
-            waveform_np,
-            sampling_rate=self.target_sample_rate,
-            return_tensors="pt",
-        )
-        inputs = {key: value.to(self.device) for key, value in inputs.items()}
-
-        with torch.no_grad():
-            logits = self.model(**inputs).logits
-
-        probabilities = torch.nn.functional.softmax(logits, dim=-1)
-        confidence, prediction = torch.max(probabilities, dim=-1)
+        scope = self.profiler.inference_scope() if self.profiler is not None else nullcontext()
+        with scope:
+            inputs = self.feature_extractor(
+                waveform_np,
+                sampling_rate=self.target_sample_rate,
+                return_tensors="pt",
+            )
+            inputs = {key: value.to(self.device) for key, value in inputs.items()}
+
+            with torch.no_grad():
+                logits = self.model(**inputs).logits
+
+            probabilities = torch.nn.functional.softmax(logits, dim=-1)
+            confidence, prediction = torch.max(probabilities, dim=-1)
 
         label = self.id2label.get(prediction.item(), "unknown")
         return {"label": label.lower(), "confidence": float(confidence.item())}
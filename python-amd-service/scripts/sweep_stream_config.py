@@ -0,0 +1,107 @@
+"""CLI to sweep window length, hop, threshold and device over a labeled corpus."""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+from services.evaluation import (
+    TABLE_COLUMNS,
+    Predictor,
+    WindowCache,
+    format_table,
+    load_corpus,
+    model_fingerprint,
+    result_rows,
+    run_sweep,
+)
+from utils.websocket_handler import StreamConfig
+
+
+def _floats(value: str) -> List[float]:
+    return [float(item) for item in value.split(",") if item.strip()]
+
+
+def _hops(value: str) -> List[Optional[float]]:
+    return [None if item.strip() == "window" else float(item) for item in value.split(",") if item.strip()]
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("corpus", type=Path, help="Directory laid out as <label>/<call>.{wav,ulaw,raw}")
+    parser.add_argument("--windows", type=_floats, default=[1.0, 1.5, 2.0, 3.0], help="Window lengths in seconds")
+    parser.add_argument(
+        "--hops",
+        type=_hops,
+        default=[None],
+        help="Hop sizes in seconds; 'window' reproduces the live non-overlapping buffer",
+    )
+    parser.add_argument(
+        "--thresholds",
+        type=_floats,
+        default=[0.6, 0.7, 0.75, 0.8, 0.9],
+        help="Values for CONFIDENCE_THRESHOLD",
+    )
+    parser.add_argument("--devices", default="cpu", help="Comma-separated torch devices to evaluate")
+    parser.add_argument("--cache", type=Path, help="JSON file persisting per-window predictions between runs")
+    parser.add_argument("--csv", type=Path, help="Also write the results table to this CSV file")
+    return parser.parse_args()
+
+
+def main() -> None:
+    dotenv_path = Path(__file__).resolve().parent.parent / ".env"
+    if dotenv_path.exists():
+        load_dotenv(dotenv_path)
+    else:
+        load_dotenv()
+
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    args = parse_args()
+
+    from models.voiceguard_loader import DEFAULT_LOCAL_SUBDIR, VoiceGUARDDetector
+
+    config = StreamConfig(fallback_label=os.getenv("FALLBACK_STRATEGY", "human"))
+    recordings = load_corpus(args.corpus)
+
+    predictors: Dict[str, Predictor] = {}
+    for device in (item.strip() for item in args.devices.split(",") if item.strip()):
+        detector = VoiceGUARDDetector(device=device)
+        predictors[device] = detector.predict
+
+    model_path = Path(os.getenv("MODEL_PATH", f"./models/{DEFAULT_LOCAL_SUBDIR}"))
+    cache = WindowCache(predictors, path=args.cache, model_id=model_fingerprint(model_path))
+    try:
+        results = run_sweep(
+            recordings,
+            cache,
+            backends=predictors,
+            window_seconds=args.windows,
+            hop_seconds=args.hops,
+            min_confidences=args.thresholds,
+            config=config,
+        )
+    finally:
+        cache.save()
+
+    print(format_table(results))
+    print(f"\n{len(recordings)} calls, {cache.misses} windows inferred, {cache.hits} served from cache")
+    print(
+        "Calls undecided when their audio ends are scored as incorrect and excluded from time-to-decision; "
+        "the live service sends no result for them, since replayed audio never triggers the silence timeout."
+    )
+
+    if args.csv:
+        with args.csv.open("w", newline="", encoding="utf-8") as handle:
+            writer = csv.writer(handle)
+            writer.writerow(TABLE_COLUMNS)
+            writer.writerows(result_rows(results))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""Offline accuracy-vs-latency sweeps over media-stream decision settings.
+
+Recordings are replayed as one uninterrupted stream of 20 ms frames followed
+by a Twilio ``stop``. In the live loop ``check_silence_timeout`` only fires
+when a message arrives after a gap, which never happens in such a replay, and
+``stop`` ends the session without dispatching anything. Calls that are not
+decided before their audio runs out are therefore reported as *undecided*
+(counted as incorrect) rather than as silence-timeout fallbacks, and are
+excluded from the time-to-decision statistics.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import math
+import struct
+import time
+from dataclasses import dataclass, replace
+from functools import cached_property
+from itertools import product
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from utils.websocket_handler import StreamConfig, apply_decision_threshold
+
+
+LOGGER = logging.getLogger(__name__)
+
+FRAME_BYTES = 160  # Twilio sends 20 ms of 8 kHz mu-law per media message
+RAW_SUFFIXES = {".ulaw", ".mulaw", ".raw"}
+WAVE_FORMAT_MULAW = 7
+
+Predictor = Callable[[bytes, int], Optional[dict]]
+
+
+@dataclass
+class LabeledRecording:
+    """Mu-law call audio with its ground-truth label."""
+
+    name: str
+    label: str
+    audio: bytes
+    sample_rate: int = 8000
+
+    @property
+    def duration_seconds(self) -> float:
+        return len(self.audio) / self.sample_rate
+
+    @cached_property
+    def digest(self) -> str:
+        """Content hash used to key cached predictions for this recording."""
+
+        hasher = hashlib.sha1(str(self.sample_rate).encode("ascii"))
+        hasher.update(self.audio)
+        return hasher.hexdigest()
+
+
+@dataclass(frozen=True)
+class SweepPoint:
+    """One combination of decision settings evaluated by the sweep."""
+
+    backend: str
+    window_seconds: float
+    hop_seconds: float
+    min_confidence: float
+
+
+@dataclass
+class WindowPrediction:
+    result: Optional[dict]
+    cpu_seconds: float
+    wall_seconds: float
+
+
+@dataclass
+class CallOutcome:
+    label: Optional[str]
+    windows: int
+    cpu_seconds: float
+    time_to_decision: Optional[float]
+
+    @property
+    def decided(self) -> bool:
+        return self.label is not None
+
+
+@dataclass
+class SweepResult:
+    point: SweepPoint
+    calls: int
+    accuracy: float
+    undecided_rate: float
+    mean_windows: float
+    cpu_seconds_per_call: float
+    mean_time_to_decision: float
+    p95_time_to_decision: float
+
+
+def _read_mulaw_wav(path: Path) -> Tuple[bytes, int]:
+    """Return the data chunk and sample rate of a mono mu-law RIFF/WAVE file."""
+
+    blob = path.read_bytes()
+    if blob[:4] != b"RIFF" or blob[8:12] != b"WAVE":
+        raise ValueError(f"{path} is not a RIFF/WAVE file")
+
+    sample_rate: Optional[int] = None
+    offset = 12
+    while offset + 8 <= len(blob):
+        chunk_id, chunk_size = struct.unpack("<4sI", blob[offset : offset + 8])
+        body = blob[offset + 8 : offset + 8 + chunk_size]
+        if chunk_id == b"fmt ":
+            format_tag, channels, sample_rate = struct.unpack("<HHI", body[:8])
+            if format_tag != WAVE_FORMAT_MULAW or channels != 1:
+                raise ValueError(f"{path} must be mono mu-law (got format {format_tag}, {channels} channels)")
+        elif chunk_id == b"data":
+            if sample_rate is None:
+                raise ValueError(f"{path} has a data chunk before its fmt chunk")
+            return body, sample_rate
+        offset += 8 + chunk_size + (chunk_size & 1)
+
+    raise ValueError(f"{path} has no data chunk")
+
+
+def model_fingerprint(model_dir: Path) -> str:
+    """Identify a model directory by its resolved path and file sizes/mtimes.
+
+    Cheap compared to hashing the weights, but changes whenever the weights
+    under ``MODEL_PATH`` are replaced or ``MODEL_PATH`` points elsewhere.
+    """
+
+    model_dir = model_dir.resolve()
+    hasher = hashlib.sha1(str(model_dir).encode("utf-8"))
+    if model_dir.is_dir():
+        for path in sorted(p for p in model_dir.rglob("*") if p.is_file()):
+            stat = path.stat()
+            hasher.update(f"{path.relative_to(model_dir)}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def load_corpus(root: Path) -> List[LabeledRecording]:
+    """Load ``<root>/<label>/<call>.{wav,ulaw,raw}`` recordings.
+
+    Headerless files are assumed to be 8 kHz mono mu-law, which is what
+    Twilio Media Streams deliver.
+    """
+
+    recordings: List[LabeledRecording] = []
+    for label_dir in sorted(p for p in root.iterdir() if p.is_dir()):
+        for path in sorted(label_dir.iterdir()):
+            suffix = path.suffix.lower()
+            if suffix == ".wav":
+                audio, sample_rate = _read_mulaw_wav(path)
+            elif suffix in RAW_SUFFIXES:
+                audio, sample_rate = path.read_bytes(), 8000
+            else:
+                continue
+
+            recordings.append(
+                LabeledRecording(
+                    name=f"{label_dir.name}/{path.name}",
+                    label=label_dir.name.lower(),
+                    audio=audio,
+                    sample_rate=sample_rate,
+                )
+            )
+
+    if not recordings:
+        raise ValueError(f"No labeled recordings found under {root}")
+    return recordings
+
+
+class WindowCache:
+    """Memoises detector output per backend and audio window.
+
+    Windows are keyed by their byte span within a recording, so grid points
+    that share a window length (any threshold, and hops that land on the same
+    offsets) reuse one forward pass. Only the winning label and its softmax
+    confidence are kept, since that is all the stream decision logic reads.
+
+    Keys include each recording's content hash, so edited corpus files are
+    re-inferred. The on-disk cache records ``model_id`` and is discarded when
+    it was written for a different model.
+    """
+
+    def __init__(
+        self,
+        predictors: Dict[str, Predictor],
+        path: Optional[Path] = None,
+        model_id: str = "",
+    ) -> None:
+        self.predictors = predictors
+        self.path = path
+        self.model_id = model_id
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, WindowPrediction] = {}
+
+        if path is not None and path.exists():
+            with path.open("r", encoding="utf-8") as handle:
+                stored = json.load(handle)
+            if stored.get("model_id") != model_id:
+                LOGGER.warning("Ignoring %s: cached predictions were made with a different model", path)
+            else:
+                self._entries = {key: WindowPrediction(**value) for key, value in stored["entries"].items()}
+                LOGGER.info("Loaded %d cached window predictions from %s", len(self._entries), path)
+
+    def get(self, backend: str, recording: LabeledRecording, start: int, end: int) -> WindowPrediction:
+        key = f"{backend}|{recording.digest}|{start}|{end}"
+        cached = self._entries.get(key)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        result = self.predictors[backend](recording.audio[start:end], recording.sample_rate)
+        prediction = WindowPrediction(
+            result=result,
+            cpu_seconds=time.process_time() - cpu_start,
+            wall_seconds=time.perf_counter() - wall_start,
+        )
+        self._entries[key] = prediction
+        return prediction
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("w", encoding="utf-8") as handle:
+            json.dump(
+                {
+                    "model_id": self.model_id,
+                    "entries": {key: vars(value) for key, value in self._entries.items()},
+                },
+                handle,
+            )
+
+
+def simulate_call(
+    recording: LabeledRecording,
+    point: SweepPoint,
+    config: StreamConfig,
+    cache: WindowCache,
+) -> CallOutcome:
+    """Replay a recording frame-by-frame through the stream decision logic.
+
+    With ``hop_seconds == window_seconds`` this matches ``MediaStreamSession``,
+    which clears its buffer after every inference. Shorter hops keep the tail
+    of the previous window. Time-to-decision is the audio time at which the
+    deciding window completed plus the inference wall time spent so far.
+    Calls still undecided when the audio ends get no label, matching a
+    ``stop`` event in the live loop.
+    """
+
+    window_bytes = int(recording.sample_rate * point.window_seconds)
+    hop_bytes = int(recording.sample_rate * point.hop_seconds)
+    call_config = replace(config, min_confidence=point.min_confidence)
+
+    start = 0
+    windows = 0
+    cpu_seconds = 0.0
+    wall_seconds = 0.0
+    for end in range(FRAME_BYTES, len(recording.audio) + FRAME_BYTES, FRAME_BYTES):
+        end = min(end, len(recording.audio))
+        if end - start < window_bytes:
+            continue
+
+        prediction = cache.get(point.backend, recording, start, end)
+        windows += 1
+        cpu_seconds += prediction.cpu_seconds
+        wall_seconds += prediction.wall_seconds
+        start = end - (window_bytes - hop_bytes)
+
+        decision = apply_decision_threshold(prediction.result, call_config)
+        if decision is not None:
+            return CallOutcome(
+                label=decision[0],
+                windows=windows,
+                cpu_seconds=cpu_seconds,
+                time_to_decision=end / recording.sample_rate + wall_seconds,
+            )
+
+    return CallOutcome(label=None, windows=windows, cpu_seconds=cpu_seconds, time_to_decision=None)
+
+
+def _percentile(values: Sequence[float], fraction: float) -> float:
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def run_sweep(
+    recordings: Sequence[LabeledRecording],
+    cache: WindowCache,
+    *,
+    backends: Iterable[str],
+    window_seconds: Iterable[float],
+    hop_seconds: Iterable[Optional[float]],
+    min_confidences: Iterable[float],
+    config: Optional[StreamConfig] = None,
+) -> List[SweepResult]:
+    """Evaluate every grid point over the corpus.
+
+    A hop of ``None`` means "equal to the window", i.e. the live behaviour.
+    Non-positive hops and hops longer than the window (which would skip
+    audio) are ignored.
+    """
+
+    config = config or StreamConfig()
+    results: List[SweepResult] = []
+    for backend, window, hop, threshold in product(backends, window_seconds, hop_seconds, min_confidences):
+        hop = window if hop is None else hop
+        if hop <= 0 or hop > window:
+            continue
+
+        point = SweepPoint(backend=backend, window_seconds=window, hop_seconds=hop, min_confidence=threshold)
+        outcomes = [
+            (recording, simulate_call(recording, point, config, cache)) for recording in recordings
+        ]
+        calls = len(outcomes)
+        ttd = [outcome.time_to_decision for _, outcome in outcomes if outcome.time_to_decision is not None]
+        results.append(
+            SweepResult(
+                point=point,
+                calls=calls,
+                accuracy=sum(outcome.label == recording.label for recording, outcome in outcomes) / calls,
+                undecided_rate=sum(not outcome.decided for _, outcome in outcomes) / calls,
+                mean_windows=sum(outcome.windows for _, outcome in outcomes) / calls,
+                cpu_seconds_per_call=sum(outcome.cpu_seconds for _, outcome in outcomes) / calls,
+                mean_time_to_decision=sum(ttd) / len(ttd) if ttd else math.nan,
+                p95_time_to_decision=_percentile(ttd, 0.95),
+            )
+        )
+    return results
+
+
+TABLE_COLUMNS = (
+    "backend",
+    "window_s",
+    "hop_s",
+    "threshold",
+    "accuracy",
+    "undecided_rate",
+    "mean_windows",
+    "cpu_s_per_call",
+    "mean_ttd_s",
+    "p95_ttd_s",
+)
+
+
+def result_rows(results: Iterable[SweepResult]) -> List[Tuple[str, ...]]:
+    return [
+        (
+            result.point.backend,
+            f"{result.point.window_seconds:g}",
+            f"{result.point.hop_seconds:g}",
+            f"{result.point.min_confidence:g}",
+            f"{result.accuracy:.3f}",
+            f"{result.undecided_rate:.3f}",
+            f"{result.mean_windows:.2f}",
+            f"{result.cpu_seconds_per_call:.3f}",
+            f"{result.mean_time_to_decision:.2f}",
+            f"{result.p95_time_to_decision:.2f}",
+        )
+        for result in results
+    ]
+
+
+def format_table(results: Iterable[SweepResult]) -> str:
+    """Render sweep results as a fixed-width text table."""
+
+    rows = [TABLE_COLUMNS, *result_rows(results)]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(TABLE_COLUMNS))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
@@ -0,0 +1,337 @@
+"""On-demand profiling capture for live VoiceGUARD2 workers."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterator, List, Optional
+
+try:
+    import torch  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    torch = None
+
+
+LOGGER = logging.getLogger(__name__)
+
+INFERENCE_RECORD_NAME = "VoiceGUARDDetector._run_inference"
+MAX_CAPTURE_SECONDS = 300.0
+TRACE_NAME_PATTERN = re.compile(r"^trace-[0-9a-f]{32}\.json$")
+MAX_STORED_TRACES = 5
+
+# Holds the capture that admitted the current session's task, so inference_scope
+# can tell its sessions apart from other calls sharing the event loop, including
+# sessions admitted by an earlier capture that are still running.
+_SESSION_CAPTURE: ContextVar[Optional["_Capture"]] = ContextVar("voiceguard_session_capture", default=None)
+
+
+@dataclass
+class ProfileRequest:
+    """Parameters bounding a single profiling capture."""
+
+    duration_seconds: float = 30.0
+    max_sessions: Optional[int] = None
+    sample_interval_ms: float = 5.0
+    torch_profiler: bool = True
+    record_shapes: bool = False
+    top_operators: int = 25
+
+    def validate(self) -> None:
+        if not 0 < self.duration_seconds <= MAX_CAPTURE_SECONDS:
+            raise ValueError(f"duration_seconds must be in (0, {MAX_CAPTURE_SECONDS:g}]")
+        if self.max_sessions is not None and self.max_sessions < 1:
+            raise ValueError("max_sessions must be a positive integer")
+        if self.sample_interval_ms < 1:
+            raise ValueError("sample_interval_ms must be at least 1")
+        if self.top_operators < 1:
+            raise ValueError("top_operators must be a positive integer")
+
+
+class StackSampler:
+    """Background thread that samples Python stacks of a single thread.
+
+    Samples are only recorded while ``enabled`` is set, so the sampler can be
+    gated on profiled sessions being active. Output uses the collapsed-stack
+    format understood by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, target_thread_id: int, interval_seconds: float) -> None:
+        self.target_thread_id = target_thread_id
+        self.interval_seconds = interval_seconds
+        self.enabled = threading.Event()
+        self.samples = 0
+        self._stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="voiceguard-stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+
+    def sample_once(self) -> None:
+        frame = sys._current_frames().get(self.target_thread_id)
+        if frame is None:
+            return
+
+        parts: List[str] = []
+        while frame is not None:
+            code = frame.f_code
+            parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+
+        self._stacks[";".join(reversed(parts))] += 1
+        self.samples += 1
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self._stacks.most_common())
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_seconds):
+            if self.enabled.is_set():
+                self.sample_once()
+
+
+class _Capture:
+    """State for one armed capture window."""
+
+    def __init__(self, request: ProfileRequest, target_thread_id: int) -> None:
+        self.request = request
+        self.started_at = time.time()
+        self.sessions_started = 0
+        self.sessions_finished = 0
+        self.active_sessions = 0
+        self.done = asyncio.Event()
+        self.sampler = StackSampler(target_thread_id, request.sample_interval_ms / 1000.0)
+        self.torch_profile = None
+
+        if request.torch_profiler and torch is not None:
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            self.torch_profile = torch.profiler.profile(activities=activities, record_shapes=request.record_shapes)
+
+    def admit(self) -> bool:
+        limit = self.request.max_sessions
+        if self.done.is_set() or (limit is not None and self.sessions_started >= limit):
+            return False
+
+        self.sessions_started += 1
+        self.active_sessions += 1
+        self.sampler.enabled.set()
+        return True
+
+    def release(self) -> None:
+        self.active_sessions -= 1
+        self.sessions_finished += 1
+        if self.active_sessions == 0:
+            self.sampler.enabled.clear()
+
+        limit = self.request.max_sessions
+        if limit is not None and self.sessions_finished >= limit:
+            self.done.set()
+
+
+class ProfilingController:
+    """Arms torch and Python profilers for a bounded window or session count.
+
+    When no capture is armed, :meth:`session_scope` and :meth:`inference_scope`
+    return a shared no-op context manager, so the hot path pays only an
+    attribute check. Chrome traces are written under ``trace_dir`` rather than
+    returned inline, and can be fetched by name via :meth:`trace_path`.
+
+    The torch profiler runs process-wide for the capture window, so the Chrome
+    trace contains everything the worker did. The operator summary, however,
+    only counts ops nested under the ``_run_inference`` marker, which is only
+    emitted for sessions admitted into the capture.
+    """
+
+    def __init__(self, trace_dir: Optional[Path] = None) -> None:
+        self.trace_dir = trace_dir or Path(tempfile.gettempdir()) / "voiceguard-profiles"
+        self._capture: Optional[_Capture] = None
+        self._busy = False
+        self._noop = nullcontext()
+
+    @property
+    def armed(self) -> bool:
+        return self._capture is not None
+
+    def session_scope(self) -> ContextManager[None]:
+        """Context manager wrapping one WebSocket session's receive loop."""
+
+        if self._capture is None:
+            return self._noop
+        return self._profiled_session(self._capture)
+
+    def inference_scope(self) -> ContextManager[Any]:
+        """Context manager wrapping a single model forward pass."""
+
+        capture = self._capture
+        if capture is None or capture.torch_profile is None or _SESSION_CAPTURE.get() is not capture:
+            return self._noop
+        return torch.profiler.record_function(INFERENCE_RECORD_NAME)
+
+    async def capture(self, request: ProfileRequest) -> Dict[str, Any]:
+        """Arm the profilers, wait for the capture to complete, and return the artifact.
+
+        Must be awaited from the event loop that serves the WebSocket sessions,
+        since that thread is the one the stack sampler observes. The profilers
+        are stopped on the loop thread, because torch keeps the profiler state
+        on the thread that started it; only building the artifact (walking
+        events and exporting the Chrome trace) runs in a worker thread so that
+        live sessions on the loop are not stalled.
+        """
+
+        request.validate()
+        if self._busy:
+            raise RuntimeError("A profiling capture is already in progress")
+
+        self._busy = True
+        capture = _Capture(request, threading.get_ident())
+        try:
+            if capture.torch_profile is not None:
+                capture.torch_profile.start()
+            capture.sampler.start()
+            self._capture = capture
+        except BaseException:
+            self._busy = False
+            raise
+        LOGGER.info(
+            "Profiling armed for %.1fs (max_sessions=%s, torch=%s)",
+            request.duration_seconds,
+            request.max_sessions,
+            capture.torch_profile is not None,
+        )
+
+        try:
+            try:
+                await asyncio.wait_for(capture.done.wait(), timeout=request.duration_seconds)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._capture = None
+                _stop_profilers(capture)
+            artifact = await asyncio.to_thread(_build_artifact, capture, self.trace_dir)
+        finally:
+            self._busy = False
+
+        LOGGER.info(
+            "Profiling capture finished after %d session(s), %d Python samples",
+            capture.sessions_finished,
+            capture.sampler.samples,
+        )
+        return artifact
+
+    def trace_path(self, name: str) -> Optional[Path]:
+        """Return the path of a previously exported Chrome trace, if it exists."""
+
+        if not TRACE_NAME_PATTERN.match(name):
+            return None
+        path = self.trace_dir / name
+        return path if path.is_file() else None
+
+    @contextmanager
+    def _profiled_session(self, capture: _Capture) -> Iterator[None]:
+        if not capture.admit():
+            yield
+            return
+        token = _SESSION_CAPTURE.set(capture)
+        try:
+            yield
+        finally:
+            _SESSION_CAPTURE.reset(token)
+            capture.release()
+
+
+def _stop_profilers(capture: _Capture) -> None:
+    capture.sampler.stop()
+    if capture.torch_profile is not None:
+        capture.torch_profile.stop()
+
+
+def _build_artifact(capture: _Capture, trace_dir: Path) -> Dict[str, Any]:
+    request = capture.request
+    artifact: Dict[str, Any] = {
+        "started_at": capture.started_at,
+        "elapsed_seconds": time.time() - capture.started_at,
+        "sessions_profiled": capture.sessions_finished,
+        "python": {
+            "format": "collapsed",
+            "interval_ms": request.sample_interval_ms,
+            "samples": capture.sampler.samples,
+            "stacks": capture.sampler.collapsed(),
+        },
+        "torch": None,
+    }
+
+    if capture.torch_profile is not None:
+        artifact["torch"] = {
+            "operators": _operator_summary(capture.torch_profile, request.top_operators),
+            "chrome_trace": _export_chrome_trace(capture.torch_profile, trace_dir),
+        }
+    return artifact
+
+
+def _operator_summary(profile: Any, limit: int) -> List[Dict[str, Any]]:
+    """Aggregate ops under the ``_run_inference`` markers, by self CPU time."""
+
+    totals: Dict[str, Dict[str, Any]] = {}
+    pending = [evt for evt in profile.events() if evt.name == INFERENCE_RECORD_NAME]
+    while pending:
+        evt = pending.pop()
+        pending.extend(evt.cpu_children)
+
+        row = totals.setdefault(
+            evt.name,
+            {
+                "name": evt.name,
+                "calls": 0,
+                "cpu_time_total_us": 0.0,
+                "self_cpu_time_total_us": 0.0,
+                "cuda_time_total_us": 0.0,
+            },
+        )
+        row["calls"] += 1
+        row["cpu_time_total_us"] += evt.cpu_time_total
+        row["self_cpu_time_total_us"] += evt.self_cpu_time_total
+        row["cuda_time_total_us"] += getattr(evt, "cuda_time_total", 0.0)
+
+    rows = sorted(totals.values(), key=lambda row: row["self_cpu_time_total_us"], reverse=True)
+    return rows[:limit]
+
+
+def _export_chrome_trace(profile: Any, trace_dir: Path) -> Optional[str]:
+    """Write the Chrome trace under ``trace_dir`` and return its file name.
+
+    Only the newest ``MAX_STORED_TRACES`` traces are kept on disk.
+    """
+
+    name = f"trace-{uuid.uuid4().hex}.json"
+    try:
+        trace_dir.mkdir(parents=True, exist_ok=True)
+        profile.export_chrome_trace(str(trace_dir / name))
+        stored = sorted(
+            (path for path in trace_dir.iterdir() if TRACE_NAME_PATTERN.match(path.name)),
+            key=lambda path: path.stat().st_mtime,
+        )
+        for stale in stored[:-MAX_STORED_TRACES]:
+            stale.unlink(missing_ok=True)
+    except (OSError, RuntimeError) as exc:
+        LOGGER.warning("Failed to export chrome trace: %s", exc)
+        return None
+    return name
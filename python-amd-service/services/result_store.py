@@ -0,0 +1,202 @@
+"""Bounded in-process index of recent detection results."""
+
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass
+class StoredDetection:
+    call_sid: str
+    label: str
+    confidence: float
+    timestamp: float
+    fallback: bool
+    sequence: int
+    stored_at: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "callSid": self.call_sid,
+            "label": self.label,
+            "confidence": self.confidence,
+            "timestamp": self.timestamp,
+            "fallback": self.fallback,
+            "sequence": self.sequence,
+        }
+
+
+class DetectionResultStore:
+    """TTL- and size-bounded map of ``call_sid`` to its latest decision.
+
+    Entries are kept in insertion order, which is also sequence and expiry
+    order, so eviction only ever pops from the front. Every record gets a
+    monotonically increasing sequence number that clients use as a cursor
+    when long-polling for new decisions. Sequence numbers restart with the
+    process, so each store also has a random ``epoch`` that clients echo back
+    to detect a restart. Intended to be used from a single event loop; no
+    locking is performed.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be a positive integer")
+        if ttl_seconds <= 0:
+            raise ValueError("ttl_seconds must be positive")
+
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: "OrderedDict[str, StoredDetection]" = OrderedDict()
+        self.epoch = uuid.uuid4().hex[:12]
+        self._sequence = 0
+        self._evicted_through = 0
+        self._updated = asyncio.Event()
+
+    @property
+    def cursor(self) -> int:
+        """Sequence number of the most recent record."""
+
+        return self._sequence
+
+    def resume_point(self, after: int, epoch: Optional[str] = None) -> Tuple[int, bool]:
+        """Return the effective cursor for a client and whether it had to be reset.
+
+        A cursor from another epoch, or one ahead of this store, cannot refer to
+        anything held here, so the client restarts from the oldest retained
+        record instead of waiting for the sequence to catch up.
+        """
+
+        if (epoch is not None and epoch != self.epoch) or after > self._sequence:
+            return 0, True
+        return max(after, 0), False
+
+    def has_gap(self, after: int) -> bool:
+        """Return True if records newer than ``after`` were evicted before delivery."""
+
+        self._evict()
+        return self._evicted_through > after
+
+    def record(
+        self,
+        call_sid: str,
+        *,
+        label: str,
+        confidence: float,
+        timestamp: float,
+        fallback: bool = False,
+    ) -> StoredDetection:
+        """Store the decision for ``call_sid`` and wake any waiting pollers."""
+
+        self._sequence += 1
+        entry = StoredDetection(
+            call_sid=call_sid,
+            label=label,
+            confidence=confidence,
+            timestamp=timestamp,
+            fallback=fallback,
+            sequence=self._sequence,
+            stored_at=self._clock(),
+        )
+        self._entries.pop(call_sid, None)
+        self._entries[call_sid] = entry
+        self._evict()
+
+        updated, self._updated = self._updated, asyncio.Event()
+        updated.set()
+        return entry
+
+    def get(self, call_sid: str) -> Optional[StoredDetection]:
+        self._evict()
+        return self._entries.get(call_sid)
+
+    def get_many(self, call_sids: Iterable[str]) -> Dict[str, StoredDetection]:
+        self._evict()
+        found: Dict[str, StoredDetection] = {}
+        for call_sid in call_sids:
+            entry = self._entries.get(call_sid)
+            if entry is not None:
+                found[call_sid] = entry
+        return found
+
+    def since(self, cursor: int, limit: int = 500) -> List[StoredDetection]:
+        """Return up to ``limit`` records newer than ``cursor``, oldest first."""
+
+        self._evict()
+        newer: List[StoredDetection] = []
+        for entry in reversed(self._entries.values()):
+            if entry.sequence <= cursor:
+                break
+            newer.append(entry)
+        newer.reverse()
+        return newer[:limit]
+
+    async def wait_since(self, cursor: int, timeout: float, limit: int = 500) -> List[StoredDetection]:
+        """Long-poll variant of :meth:`since` that waits up to ``timeout`` seconds."""
+
+        deadline = self._clock() + timeout
+        while True:
+            newer = self.since(cursor, limit)
+            remaining = deadline - self._clock()
+            if newer or remaining <= 0:
+                return newer
+
+            try:
+                await asyncio.wait_for(self._updated.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return []
+
+    async def follow(
+        self,
+        cursor: int,
+        *,
+        reset: bool = False,
+        heartbeat_seconds: float = 15.0,
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield ``(event, payload)`` pairs for records newer than ``cursor``, forever.
+
+        Events are ``detection_result`` with a :class:`StoredDetection`,
+        ``keepalive`` with ``None`` after ``heartbeat_seconds`` without news, and
+        ``resync`` with ``{"epoch", "reset", "gap"}``. A ``resync`` is emitted
+        first when ``reset`` is set, and again whenever records past the cursor
+        are evicted before they could be yielded, e.g. while a slow consumer
+        holds the generator.
+        """
+
+        gap_reported = False
+        while True:
+            gap = self.has_gap(cursor)
+            if reset or (gap and not gap_reported):
+                yield "resync", {"epoch": self.epoch, "reset": reset, "gap": gap}
+                reset = False
+            gap_reported = gap
+
+            entries = await self.wait_since(cursor, timeout=heartbeat_seconds)
+            if not entries:
+                yield "keepalive", None
+                continue
+            for entry in entries:
+                cursor = entry.sequence
+                yield "detection_result", entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evict(self) -> None:
+        expires_before = self._clock() - self.ttl_seconds
+        while self._entries:
+            oldest = next(iter(self._entries.values()))
+            if len(self._entries) <= self.max_entries and oldest.stored_at > expires_before:
+                break
+            _, evicted = self._entries.popitem(last=False)
+            self._evicted_through = max(self._evicted_through, evicted.sequence)
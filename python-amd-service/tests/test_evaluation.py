@@ -0,0 +1,141 @@
+import math
+import struct
+import tempfile
+import unittest
+from pathlib import Path
+
+from services.evaluation import LabeledRecording, WindowCache, load_corpus, model_fingerprint, run_sweep
+from utils.websocket_handler import StreamConfig
+
+
+def _confident_after(seconds, label, confidence=0.9):
+    """Fake predictor that only becomes confident once enough audio has been seen."""
+
+    def predict(audio, sample_rate):
+        if len(audio) >= seconds * sample_rate:
+            return {"label": label, "confidence": confidence}
+        return {"label": label, "confidence": 0.5}
+
+    return predict
+
+
+class RunSweepTestCase(unittest.TestCase):
+    def setUp(self):
+        self.recordings = [
+            LabeledRecording(name="machine/a.ulaw", label="machine", audio=b"\xff" * 8000 * 4),
+            LabeledRecording(name="human/b.ulaw", label="human", audio=b"\xff" * 8000),
+        ]
+        self.config = StreamConfig(fallback_label="human")
+
+    def test_thresholds_reuse_cached_windows(self):
+        cache = WindowCache({"fake": _confident_after(2, "machine")})
+        results = run_sweep(
+            self.recordings,
+            cache,
+            backends=["fake"],
+            window_seconds=[2.0],
+            hop_seconds=[None],
+            min_confidences=[0.75, 0.95],
+            config=self.config,
+        )
+
+        confident, strict = results
+        self.assertEqual(cache.misses, 2)
+        self.assertEqual(cache.hits, 1)
+
+        self.assertEqual(confident.accuracy, 0.5)
+        self.assertEqual(confident.undecided_rate, 0.5)
+        self.assertAlmostEqual(confident.mean_windows, 0.5)
+        self.assertGreaterEqual(confident.mean_time_to_decision, 2.0)
+
+        self.assertEqual(strict.accuracy, 0.0)
+        self.assertEqual(strict.undecided_rate, 1.0)
+        self.assertAlmostEqual(strict.mean_windows, 1.0)
+        self.assertTrue(math.isnan(strict.mean_time_to_decision))
+
+    def test_overlapping_hop_decides_sooner(self):
+        def beep_detector(audio, sample_rate):
+            confidence = 0.9 if audio.count(b"\x01") >= sample_rate // 2 else 0.5
+            return {"label": "machine", "confidence": confidence}
+
+        beep = LabeledRecording(name="machine/beep.ulaw", label="machine", audio=b"\x00" * 6000 + b"\x01" * 26000)
+        cache = WindowCache({"fake": beep_detector})
+        live, overlapped = run_sweep(
+            [beep],
+            cache,
+            backends=["fake"],
+            window_seconds=[1.0],
+            hop_seconds=[None, 0.5],
+            min_confidences=[0.75],
+            config=self.config,
+        )
+
+        self.assertEqual(live.accuracy, 1.0)
+        self.assertEqual(overlapped.accuracy, 1.0)
+        self.assertGreaterEqual(live.mean_time_to_decision, 2.0)
+        self.assertLess(overlapped.mean_time_to_decision, 2.0)
+
+
+class WindowCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def _predict(self, audio, sample_rate):
+        self.calls += 1
+        return {"label": "machine", "confidence": 0.9}
+
+    def test_persisted_cache_is_keyed_by_model_and_content(self):
+        recording = LabeledRecording(name="machine/a.ulaw", label="machine", audio=b"\xff" * 160)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "cache.json"
+            first = WindowCache({"cpu": self._predict}, path=path, model_id="model-a")
+            first.get("cpu", recording, 0, 160)
+            first.save()
+
+            same = WindowCache({"cpu": self._predict}, path=path, model_id="model-a")
+            same.get("cpu", recording, 0, 160)
+            self.assertEqual((same.hits, same.misses), (1, 0))
+
+            edited = LabeledRecording(name=recording.name, label="machine", audio=b"\x00" * 160)
+            same.get("cpu", edited, 0, 160)
+            self.assertEqual(same.misses, 1)
+
+            other_model = WindowCache({"cpu": self._predict}, path=path, model_id="model-b")
+            other_model.get("cpu", recording, 0, 160)
+            self.assertEqual((other_model.hits, other_model.misses), (0, 1))
+
+        self.assertEqual(self.calls, 3)
+
+    def test_model_fingerprint_changes_with_weights(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            weights = Path(tmp) / "model.safetensors"
+            weights.write_bytes(b"a")
+            before = model_fingerprint(Path(tmp))
+            weights.write_bytes(b"bb")
+
+            self.assertNotEqual(before, model_fingerprint(Path(tmp)))
+
+
+class LoadCorpusTestCase(unittest.TestCase):
+    def test_reads_raw_and_mulaw_wav(self):
+        data = b"\x7f" * 320
+        fmt = struct.pack("<HHIIHH", 7, 1, 8000, 8000, 1, 8)
+        wav = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + b"data" + struct.pack("<I", len(data)) + data
+        wav = b"RIFF" + struct.pack("<I", len(wav)) + wav
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "Machine").mkdir()
+            (root / "human").mkdir()
+            (root / "Machine" / "vm.wav").write_bytes(wav)
+            (root / "human" / "caller.ulaw").write_bytes(b"\xff" * 160)
+            (root / "human" / "notes.txt").write_text("ignored")
+
+            recordings = load_corpus(root)
+
+        self.assertEqual([(r.label, len(r.audio)) for r in recordings], [("machine", 320), ("human", 160)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,202 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest import mock
+
+from services.profiling import (
+    INFERENCE_RECORD_NAME,
+    ProfileRequest,
+    ProfilingController,
+    StackSampler,
+    _operator_summary,
+)
+
+
+class FakeTorchProfile:
+    def __init__(self, **kwargs):
+        self.start_thread = None
+        self.stop_thread = None
+
+    def start(self):
+        self.start_thread = threading.get_ident()
+
+    def stop(self):
+        self.stop_thread = threading.get_ident()
+
+    def events(self):
+        return []
+
+    def export_chrome_trace(self, path):
+        Path(path).write_text("{}")
+
+
+def _fake_torch(profiles):
+    def profile(**kwargs):
+        profiles.append(FakeTorchProfile(**kwargs))
+        return profiles[-1]
+
+    return SimpleNamespace(
+        cuda=SimpleNamespace(is_available=lambda: False),
+        profiler=SimpleNamespace(
+            ProfilerActivity=SimpleNamespace(CPU="cpu", CUDA="cuda"),
+            profile=profile,
+            record_function=lambda name: nullcontext(name),
+        ),
+    )
+
+
+class ProfilingControllerTestCase(unittest.TestCase):
+    def test_scopes_are_noop_when_not_armed(self):
+        controller = ProfilingController()
+
+        self.assertFalse(controller.armed)
+        self.assertIs(controller.session_scope(), controller.session_scope())
+        self.assertIs(controller.inference_scope(), controller.session_scope())
+
+    def test_capture_finishes_after_max_sessions(self):
+        controller = ProfilingController()
+        request = ProfileRequest(duration_seconds=5, max_sessions=2, torch_profiler=False)
+
+        async def run_sessions():
+            await asyncio.sleep(0)
+            for _ in range(3):
+                with controller.session_scope():
+                    await asyncio.sleep(0.02)
+
+        async def scenario():
+            capture = asyncio.create_task(controller.capture(request))
+            await run_sessions()
+            return await capture
+
+        artifact = asyncio.run(scenario())
+
+        self.assertEqual(artifact["sessions_profiled"], 2)
+        self.assertIsNone(artifact["torch"])
+        self.assertFalse(controller.armed)
+
+    def test_torch_profiler_stops_on_the_thread_that_started_it(self):
+        profiles = []
+
+        async def scenario():
+            with tempfile.TemporaryDirectory() as tmp:
+                controller = ProfilingController(trace_dir=Path(tmp))
+                artifact = await controller.capture(ProfileRequest(duration_seconds=0.01))
+                return artifact, threading.get_ident(), controller.trace_path(artifact["torch"]["chrome_trace"])
+
+        with mock.patch("services.profiling.torch", _fake_torch(profiles)):
+            artifact, loop_thread, trace = asyncio.run(scenario())
+
+        (profile,) = profiles
+        self.assertEqual(profile.start_thread, loop_thread)
+        self.assertEqual(profile.stop_thread, loop_thread)
+        self.assertEqual(artifact["torch"]["operators"], [])
+        self.assertIsNotNone(trace)
+
+    def test_inference_scope_ignores_sessions_admitted_by_earlier_capture(self):
+        controller = ProfilingController()
+        scopes = {}
+
+        async def session(name, armed, finished):
+            with controller.session_scope():
+                armed.set()
+                await finished.wait()
+                scopes[name] = controller.inference_scope()
+
+        async def scenario():
+            first_armed, second_armed, finished = asyncio.Event(), asyncio.Event(), asyncio.Event()
+            first = asyncio.create_task(controller.capture(ProfileRequest(duration_seconds=0.05)))
+            await asyncio.sleep(0)
+            carried_over = asyncio.create_task(session("carried_over", first_armed, finished))
+            await first_armed.wait()
+            await first
+
+            second = asyncio.create_task(controller.capture(ProfileRequest(duration_seconds=0.05)))
+            await asyncio.sleep(0)
+            admitted = asyncio.create_task(session("admitted", second_armed, finished))
+            await second_armed.wait()
+            finished.set()
+            await asyncio.gather(carried_over, admitted)
+            return await second
+
+        with tempfile.TemporaryDirectory() as tmp, mock.patch("services.profiling.torch", _fake_torch([])):
+            controller.trace_dir = Path(tmp)
+            artifact = asyncio.run(scenario())
+
+        self.assertIs(scopes["carried_over"], controller.session_scope())
+        self.assertEqual(scopes["admitted"].enter_result, INFERENCE_RECORD_NAME)
+        self.assertEqual(artifact["sessions_profiled"], 1)
+
+    def test_rejects_concurrent_capture(self):
+        controller = ProfilingController()
+
+        async def scenario():
+            first = asyncio.create_task(controller.capture(ProfileRequest(duration_seconds=0.05, torch_profiler=False)))
+            await asyncio.sleep(0)
+            with self.assertRaises(RuntimeError):
+                await controller.capture(ProfileRequest(duration_seconds=0.05, torch_profiler=False))
+            await first
+
+        asyncio.run(scenario())
+
+    def test_trace_path_rejects_unknown_names(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            controller = ProfilingController(trace_dir=Path(tmp))
+            name = "trace-" + "0" * 32 + ".json"
+            (Path(tmp) / name).write_text("{}")
+
+            self.assertEqual(controller.trace_path(name), Path(tmp) / name)
+            self.assertIsNone(controller.trace_path("../" + name))
+            self.assertIsNone(controller.trace_path("trace-" + "1" * 32 + ".json"))
+
+    def test_rejects_unbounded_duration(self):
+        with self.assertRaises(ValueError):
+            ProfileRequest(duration_seconds=0).validate()
+
+
+def _event(name, self_us, children=()):
+    children = list(children)
+    total = self_us + sum(child.cpu_time_total for child in children)
+    return SimpleNamespace(
+        name=name,
+        cpu_children=children,
+        cpu_time_total=total,
+        self_cpu_time_total=self_us,
+        cuda_time_total=0.0,
+    )
+
+
+class OperatorSummaryTestCase(unittest.TestCase):
+    def test_only_counts_ops_under_inference_marker(self):
+        inference = _event(INFERENCE_RECORD_NAME, 1, [_event("aten::conv1d", 30), _event("aten::linear", 5)])
+        unrelated = _event("aten::conv1d", 100)
+        profile = SimpleNamespace(events=lambda: [inference, *inference.cpu_children, unrelated])
+
+        rows = {row["name"]: row for row in _operator_summary(profile, limit=10)}
+
+        self.assertEqual(rows["aten::conv1d"]["calls"], 1)
+        self.assertEqual(rows["aten::conv1d"]["self_cpu_time_total_us"], 30)
+        self.assertEqual(rows[INFERENCE_RECORD_NAME]["cpu_time_total_us"], 36)
+        self.assertEqual(len(_operator_summary(profile, limit=1)), 1)
+
+
+class StackSamplerTestCase(unittest.TestCase):
+    def test_collapsed_output_includes_caller(self):
+        sampler = StackSampler(threading.get_ident(), interval_seconds=0.001)
+
+        def outer_frame():
+            sampler.sample_once()
+
+        outer_frame()
+
+        self.assertEqual(sampler.samples, 1)
+        stack, count = sampler.collapsed().rsplit(" ", 1)
+        self.assertEqual(count, "1")
+        self.assertIn("outer_frame (test_profiling.py:", stack.split(";")[-2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import unittest
+
+from services.result_store import DetectionResultStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class DetectionResultStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.store = DetectionResultStore(max_entries=3, ttl_seconds=60, clock=self.clock)
+
+    def _record(self, call_sid, **overrides):
+        fields = {"label": "machine", "confidence": 0.9, "timestamp": 1.0}
+        fields.update(overrides)
+        return self.store.record(call_sid, **fields)
+
+    def test_get_many_reports_found_entries(self):
+        self._record("CA1")
+        self._record("CA2", label="human", confidence=0.0, fallback=True)
+
+        found = self.store.get_many(["CA1", "CA2", "CA3"])
+
+        self.assertEqual(sorted(found), ["CA1", "CA2"])
+        self.assertTrue(found["CA2"].fallback)
+        self.assertEqual(found["CA2"].to_dict()["callSid"], "CA2")
+
+    def test_evicts_oldest_beyond_capacity_and_expired(self):
+        for index in range(4):
+            self._record(f"CA{index}")
+        self.assertIsNone(self.store.get("CA0"))
+        self.assertEqual(len(self.store), 3)
+
+        self.clock.now = 61
+        self._record("CA9")
+        self.assertEqual(list(self.store.get_many(["CA1", "CA2", "CA3", "CA9"])), ["CA9"])
+
+    def test_since_returns_records_after_cursor_in_order(self):
+        first = self._record("CA1")
+        self._record("CA2")
+        self._record("CA1", label="human")
+
+        newer = self.store.since(first.sequence)
+
+        self.assertEqual([(entry.call_sid, entry.sequence) for entry in newer], [("CA2", 2), ("CA1", 3)])
+        self.assertEqual(self.store.since(self.store.cursor), [])
+
+    def test_resume_point_resets_cursor_from_previous_process(self):
+        for index in range(3):
+            self._record(f"CA{index}")
+
+        self.assertEqual(self.store.resume_point(5000), (0, True))
+        self.assertEqual(self.store.resume_point(2, epoch="previous-run"), (0, True))
+        self.assertEqual(self.store.resume_point(2, epoch=self.store.epoch), (2, False))
+
+        after, _ = self.store.resume_point(5000, epoch="previous-run")
+        self.assertEqual([entry.call_sid for entry in self.store.since(after)], ["CA0", "CA1", "CA2"])
+        self.assertNotEqual(DetectionResultStore().epoch, self.store.epoch)
+
+    def test_has_gap_when_undelivered_records_were_evicted(self):
+        for index in range(5):
+            self._record(f"CA{index}")
+
+        self.assertTrue(self.store.has_gap(1))
+        self.assertFalse(self.store.has_gap(2))
+
+        self._record("CA3", label="human")
+        self.assertFalse(self.store.has_gap(2))
+
+        self.clock.now = 61
+        self.assertTrue(self.store.has_gap(5))
+        self.assertEqual(self.store.since(5), [])
+
+    def test_follow_reports_gap_when_records_are_evicted_mid_stream(self):
+        async def scenario():
+            events = []
+            stream = self.store.follow(0, heartbeat_seconds=0.01)
+            self._record("CA0")
+            events.append(await stream.__anext__())
+
+            # The consumer stalls while more records arrive than the store holds.
+            for index in range(1, 6):
+                self._record(f"CA{index}")
+            events.extend([await stream.__anext__() for _ in range(4)])
+            self._record("CA6")
+            events.append(await stream.__anext__())
+            await stream.aclose()
+            return events
+
+        events = asyncio.run(scenario())
+
+        kinds = [event for event, _ in events]
+        self.assertEqual(kinds, ["detection_result", "resync", *["detection_result"] * 4])
+        self.assertEqual(events[1][1], {"epoch": self.store.epoch, "reset": False, "gap": True})
+        self.assertEqual([payload.call_sid for _, payload in events[2:]], ["CA3", "CA4", "CA5", "CA6"])
+
+    def test_follow_announces_reset_once(self):
+        async def scenario():
+            stream = self.store.follow(0, reset=True, heartbeat_seconds=0.01)
+            events = [await stream.__anext__() for _ in range(2)]
+            await stream.aclose()
+            return events
+
+        (first, first_payload), (second, _) = asyncio.run(scenario())
+
+        self.assertEqual((first, first_payload["reset"], first_payload["gap"]), ("resync", True, False))
+        self.assertEqual(second, "keepalive")
+
+    def test_wait_since_wakes_on_new_record(self):
+        async def scenario():
+            waiter = asyncio.create_task(self.store.wait_since(0, timeout=5))
+            await asyncio.sleep(0)
+            self._record("CA1")
+            return await waiter
+
+        entries = asyncio.run(scenario())
+
+        self.assertEqual([entry.call_sid for entry in entries], ["CA1"])
+
+    def test_wait_since_times_out_empty(self):
+        store = DetectionResultStore()
+        self.assertEqual(asyncio.run(store.wait_since(0, timeout=0.01)), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -5,7 +5,7 @@ from __future__ import annotations
 import base64
 import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Optional, Tuple
 
 from services.audio_processor import AudioBuffer, AudioBufferConfig
 
@@ -28,6 +28,20 @@ class DetectionResult:
     timestamp: float
 
 
+def apply_decision_threshold(result: Optional[dict], config: StreamConfig) -> Optional[Tuple[str, float]]:
+    """Return ``(label, confidence)`` if a detector result is confident enough to act on."""
+
+    if result is None:
+        return None
+
+    label = result.get("label") or config.fallback_label
+    confidence = float(result.get("confidence", 0.0))
+
+    if confidence < config.min_confidence:
+        return None
+    return label, confidence
+
+
 class MediaStreamSession:
     """Accumulates audio from a Twilio Media Stream for AMD."""
 
@@ -52,16 +66,11 @@ class MediaStreamSession:
             return None
 
         audio_bytes = self.buffer.get_bytes()
-        result = self.detector.predict(audio_bytes)
-        if result is None:
-            return None
-
-        label = result.get("label") or self.config.fallback_label
-        confidence = float(result.get("confidence", 0.0))
-
-        if confidence < self.config.min_confidence:
+        decision = apply_decision_threshold(self.detector.predict(audio_bytes), self.config)
+        if decision is None:
             return None
 
+        label, confidence = decision
         self.detection_made = True
         return DetectionResult(label=label, confidence=confidence, timestamp=time.time())
 